@@ -9,75 +9,365 @@ WAVファイルのみ対応、FFmpegとpydub不要
 
 import os
 import sys
-from datetime import datetime, timedelta
+from datetime import datetime
+import json
+import threading
+import time
+import tempfile
+import hashlib
+import sqlite3
+import re
+import struct
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# 必要なライブラリのインポートを安全に行う
-try:
-    import json
-    import threading
-    import tkinter as tk
-    from tkinter import filedialog, messagebox, scrolledtext, ttk
-    from openai import OpenAI
-    import wave
-    import configparser
-    import re
-    IMPORTS_OK = True
-    MISSING_MODULE = ""
-except ImportError as e:
-    IMPORTS_OK = False
-    MISSING_MODULE = str(e)
+# 起動を速くするため、openai・tkinter・wave・configparser は使用時に読み込む
+
+# 詳細ログは環境変数 WAV_SUBTITLE_DEBUG を設定した場合のみ出力
+# （GUI起動時にコンソールへの出力で処理が止まらないようにする）
+logger = logging.getLogger("wav_subtitle")
+if os.environ.get("WAV_SUBTITLE_DEBUG"):
+    logging.basicConfig(level=logging.DEBUG)
+
+# Whisper APIのアップロード上限
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+# 処理できるWAVの最大長（秒）。ハッシュ計算・無音検出・圧縮でファイル全体を読む前にヘッダーで判定する
+MAX_WAV_SECONDS = 4 * 60 * 60
+# 認識結果の整形用（連続する空白と、Whisperが出力する効果音の注記）
+WHITESPACE_PATTERN = re.compile(r"\s+")
+FILLER_PATTERN = re.compile(r"[\[(](?:music|applause|laughter|silence)[\])]|♪", re.IGNORECASE)
+# 結果表示を編集不可にする字幕数（長い結果での再レイアウトを防ぐ）
+READ_ONLY_SEGMENT_THRESHOLD = 500
+# 別スレッドからのGUI更新を反映する間隔（ミリ秒）
+UI_POLL_INTERVAL_MS = 50
+# 翻訳モデルの選択肢（表示名 → モデル名）
+TRANSLATION_MODELS = {
+    "速度優先 (gpt-4o-mini)": "gpt-4o-mini",
+    "品質優先 (gpt-4)": "gpt-4",
+}
+DEFAULT_TRANSLATION_MODEL = "gpt-4o-mini"
+# JSONモード（response_format=json_object）に対応していないモデル
+JSON_MODE_UNSUPPORTED_MODELS = {"gpt-4"}
+# 訳文の最大トークン数（英語の文字数に対する倍率と下限、字幕1件あたりの上限）
+MAX_TOKENS_PER_CHAR = 3
+MIN_MAX_TOKENS = 16
+MAX_CUE_TOKENS = 400
+# ローカル翻訳モデル（NLLB）と1回の推論で処理するセグメント数
+LOCAL_TRANSLATION_MODEL = "facebook/nllb-200-distilled-600M"
+LOCAL_TRANSLATION_BATCH_SIZE = 32
+# 翻訳リクエストの同時実行数（アカウントのレート制限に応じて調整）
+TRANSLATION_CONCURRENCY = 20
+# レート制限（429）時のリトライ回数
+MAX_RETRIES = 5
+# 一括翻訳の1リクエストあたりのセグメント数と文字数の上限（入力約2kトークン以内）
+BATCH_SIZE = 20
+BATCH_MAX_CHARS = 6000
+# Batch APIの状態確認間隔（秒）
+BATCH_POLL_INTERVAL = 30
+# 翻訳キャッシュの保存先と最大件数
+TRANSLATION_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".wav_subtitle_cache.db")
+TRANSLATION_CACHE_MAX_ENTRIES = 100000
+# 音声認識モデルと認識結果キャッシュの保存先
+WHISPER_MODEL = "whisper-1"
+TRANSCRIPT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".wav_subtitle_cache")
+# ローカル音声認識（faster-whisper）のモデル
+LOCAL_WHISPER_MODEL = "large-v3"
+# 分割認識のチャンク長の上限（秒）と同時実行数
+CHUNK_SECONDS = 30
+TRANSCRIPTION_WORKERS = 4
+# 無音除去（WebRTC VAD）の感度・フレーム長・発話区間の前後余白
+VAD_AGGRESSIVENESS = 2
+VAD_SAMPLE_RATE = 16000
+VAD_FRAME_MS = 20
+VAD_PADDING_MS = 200
+# これより短い無音は発話の途中とみなし、前後の発話区間を同じチャンクにまとめる
+VAD_MIN_SILENCE_MS = 1500
+# アップロード前に変換するサンプルレート（Whisperは16kHzで処理する）
+UPLOAD_SAMPLE_RATE = 16000
+# 無音検出・圧縮でWAVを読み込む単位（秒）。長時間の音声でもファイル全体をメモリに載せない
+AUDIO_BLOCK_SECONDS = 10
+# HTTP接続プールの上限（並列翻訳・認識で接続を使い回す）
+HTTP_MAX_CONNECTIONS = 32
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 16
+
+class TranslationCache:
+    """英語テキストのSHA-256をキーとする翻訳結果のキャッシュ（SQLite）"""
+    
+    def __init__(self, db_path=TRANSLATION_CACHE_FILE, max_entries=TRANSLATION_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        try:
+            # 翻訳は複数スレッドから呼ばれるため、接続はロックで保護して共有する
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS tx(hash TEXT PRIMARY KEY, ja TEXT, ts INTEGER)")
+            self.conn.commit()
+            # 件数は起動時に1回だけ数え、以降は追加分を加算して上限チェックに使う
+            self.entry_count = self.conn.execute("SELECT COUNT(*) FROM tx").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning("翻訳キャッシュを開けません（キャッシュなしで続行）: %s", e)
+            self.conn = None
+        # ヒットしたキーの参照時刻（読み込みのたびに書き込まないよう、次の書き込み時にまとめて反映）
+        self.touched = {}
+    
+    def make_key(self, english_text, model, system_prompt):
+        """キャッシュキーを作成（モデルやプロンプトが変われば別キー）"""
+        source = "\0".join([english_text, model, system_prompt])
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+    
+    def get(self, key):
+        """キャッシュから訳文を取得（なければNone）"""
+        if self.conn is None:
+            return None
+        try:
+            with self.lock:
+                row = self.conn.execute("SELECT ja FROM tx WHERE hash=?", (key,)).fetchone()
+                if row is None:
+                    return None
+                # 最近使ったものを残すため参照時刻を記録
+                self.touched[key] = time.time_ns()
+                return row[0]
+        except sqlite3.Error as e:
+            logger.warning("翻訳キャッシュ読み込みエラー: %s", e)
+            return None
+    
+    def put(self, key, japanese_text):
+        """訳文をキャッシュに保存"""
+        self.put_many([(key, japanese_text)])
+    
+    def put_many(self, items):
+        """(キー, 訳文) のリストを1回のトランザクションで保存し、上限を超えた古いものを削除"""
+        if self.conn is None or not items:
+            return
+        try:
+            with self.lock:
+                now = time.time_ns()
+                before = self.conn.total_changes
+                self.conn.executemany("INSERT OR IGNORE INTO tx(hash, ja, ts) VALUES(?, ?, ?)",
+                                      [(key, japanese_text, now) for key, japanese_text in items])
+                self.entry_count += self.conn.total_changes - before
+                self.conn.executemany("UPDATE tx SET ja=?, ts=? WHERE hash=?",
+                                      [(japanese_text, now, key) for key, japanese_text in items])
+                self.write_touched()
+                if self.entry_count > self.max_entries:
+                    self.conn.execute("DELETE FROM tx WHERE hash IN (SELECT hash FROM tx ORDER BY ts LIMIT ?)",
+                                      (self.entry_count - self.max_entries,))
+                    self.entry_count = self.max_entries
+                self.conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("翻訳キャッシュ書き込みエラー: %s", e)
+    
+    def flush(self):
+        """記録済みの参照時刻をまとめて保存"""
+        if self.conn is None or not self.touched:
+            return
+        try:
+            with self.lock:
+                self.write_touched()
+                self.conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("翻訳キャッシュ書き込みエラー: %s", e)
+    
+    def write_touched(self):
+        """記録済みの参照時刻を書き込む（ロック取得済みの状態で呼ぶ）"""
+        if self.touched:
+            self.conn.executemany("UPDATE tx SET ts=? WHERE hash=?",
+                                  [(ts, key) for key, ts in self.touched.items()])
+            self.touched.clear()
+
+class LocalTranslator:
+    """ローカルの翻訳モデル（NLLB）による英日翻訳（transformers・torchが必要）"""
+    
+    def __init__(self, model_name=LOCAL_TRANSLATION_MODEL):
+        try:
+            import importlib.util
+            import torch
+            from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+        except ImportError as e:
+            raise ImportError(f"ローカル翻訳には transformers と torch が必要です"
+                              f"（pip install transformers torch sentencepiece）: {e}") from e
+        
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, src_lang="eng_Latn")
+        if torch.cuda.is_available() and importlib.util.find_spec("bitsandbytes") is not None:
+            # GPUではint8量子化して読み込み、メモリと推論時間を削減
+            from transformers import BitsAndBytesConfig
+            self.model = AutoModelForSeq2SeqLM.from_pretrained(
+                model_name,
+                quantization_config=BitsAndBytesConfig(load_in_8bit=True),
+                device_map="auto"
+            )
+        else:
+            self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        self.target_token_id = self.tokenizer.convert_tokens_to_ids("jpn_Jpan")
+        # モデルは複数スレッドから同時に推論しない
+        self.lock = threading.Lock()
+    
+    def translate_batch(self, texts):
+        """複数の英語テキストを1回の推論でまとめて翻訳"""
+        with self.lock, self.torch.no_grad():
+            inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+            inputs = inputs.to(self.model.device)
+            outputs = self.model.generate(
+                **inputs,
+                forced_bos_token_id=self.target_token_id,
+                num_beams=1,
+                max_new_tokens=128
+            )
+        return [text.strip() for text in self.tokenizer.batch_decode(outputs, skip_special_tokens=True)]
+
+class LocalTranscriber:
+    """faster-whisper（CTranslate2）によるローカル音声認識（faster-whisperが必要）"""
+    
+    def __init__(self, model_size=LOCAL_WHISPER_MODEL):
+        try:
+            import ctranslate2
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise ImportError(f"ローカル音声認識には faster-whisper が必要です"
+                              f"（pip install faster-whisper）: {e}") from e
+        
+        # GPUがあればint8+float16、CPUのみならint8で実行
+        compute_type = "int8_float16" if ctranslate2.get_cuda_device_count() > 0 else "int8"
+        self.model = WhisperModel(model_size, device="auto", compute_type=compute_type)
+    
+    def transcribe(self, audio_file):
+        """音声を認識し、(セグメントのイテレータ, 音声の長さ) を返す（セグメントは認識され次第得られる）"""
+        segments, info = self.model.transcribe(audio_file, language="en", vad_filter=True,
+                                               word_timestamps=False)
+        return ({'start': segment.start, 'end': segment.end, 'text': segment.text}
+                for segment in segments), info.duration
 
 class EnglishToJapaneseSubtitle:
     def __init__(self, api_key=None):
-        if not IMPORTS_OK:
-            return
         self.client = None
+        # 翻訳は専用スレッドのイベントループ上で非同期クライアントを使って並行実行する
+        self.async_client = None
+        self.event_loop = None
+        self.event_loop_lock = threading.Lock()
+        # 同時実行数を制限するセマフォ（イベントループのスレッドで初回使用時に作成）
+        self.translation_semaphore = None
+        # 翻訳キャッシュのヒット数と照会数（ファイルごとに集計）
+        self.cache_hit_count = 0
+        self.cache_lookup_count = 0
+        self.translation_model = DEFAULT_TRANSLATION_MODEL
+        # 翻訳エンジン（"openai" または "local"）
+        self.translation_engine = "openai"
+        self.local_translator = None
+        # 音声認識エンジン（"openai" または "local"）
+        self.stt_engine = "openai"
+        self.local_transcriber = None
+        self.translation_cache = TranslationCache()
         
         if api_key:
             self.set_api_key(api_key)
     
     def set_api_key(self, api_key):
-        """OpenAI APIキーを設定"""
+        """OpenAI APIキーを設定（通信は行わない。有効性の確認はvalidate_api_keyで行う）"""
         try:
-            self.client = OpenAI(api_key=api_key)
-            # APIキーの有効性をテスト
-            self.client.models.list()
+            import importlib.util
+            import httpx
+            from openai import AsyncOpenAI, OpenAI
+            
+            if self.client is not None:
+                self.client.close()
+            if self.async_client is not None:
+                self.run_async(self.async_client.close())
+            # 全スレッドで1つのクライアントを共有し、TCP/TLS接続を再利用する
+            http2 = importlib.util.find_spec("h2") is not None
+            limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                  max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS)
+            self.client = OpenAI(api_key=api_key, http_client=httpx.Client(http2=http2, limits=limits))
+            self.async_client = AsyncOpenAI(api_key=api_key,
+                                            http_client=httpx.AsyncClient(http2=http2, limits=limits))
             return True
         except Exception as e:
-            print(f"APIキー設定エラー: {e}")
+            logger.warning("APIキー設定エラー: %s", e)
             self.client = None
+            self.async_client = None
             return False
     
+    def validate_api_key(self, client=None):
+        """APIキーの有効性をテスト（通信が発生するためバックグラウンドで呼ぶ。clientは確認対象のクライアント）"""
+        if client is None:
+            client = self.client
+        if client is None:
+            return False
+        try:
+            client.models.list()
+            return True
+        except Exception as e:
+            logger.warning("APIキー確認エラー: %s", e)
+            # 確認中に別のキーが設定されていた場合は、新しいクライアントを消さない
+            if self.client is client:
+                self.client = None
+                self.async_client = None
+            return False
+    
+    def run_async(self, coro):
+        """翻訳用イベントループでコルーチンを実行（どのスレッドからでも呼べる。concurrent.futures.Futureを返す）"""
+        # asyncioは読み込みが重いため、翻訳を始めるまで読み込まない
+        import asyncio
+        with self.event_loop_lock:
+            if self.event_loop is None:
+                self.event_loop = asyncio.new_event_loop()
+                threading.Thread(target=self.event_loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self.event_loop)
+    
+    def requires_api_key(self):
+        """現在のエンジン設定でOpenAI APIキーが必要かどうか"""
+        return self.stt_engine == "openai" or self.translation_engine == "openai"
+    
+    def get_local_transcriber(self):
+        """ローカル音声認識モデルを取得（初回のみ読み込み）"""
+        if self.local_transcriber is None:
+            self.local_transcriber = LocalTranscriber()
+        return self.local_transcriber
+    
+    def read_wav_header(self, wav_file):
+        """標準的な44バイトのRIFFヘッダーから (チャンネル数, サンプル幅, サンプルレート, フレーム数) を取得"""
+        with open(wav_file, 'rb') as f:
+            header = f.read(44)
+        if len(header) < 44:
+            return None
+        
+        (riff, _, wave_id, fmt_id, fmt_size, audio_format, channels, framerate,
+         _, block_align, bits, data_id, data_size) = struct.unpack('<4sI4s4sIHHIIHH4sI', header)
+        # 非PCMや拡張チャンク付きなどの形式はNone（waveモジュールで読む）
+        if (riff != b'RIFF' or wave_id != b'WAVE' or fmt_id != b'fmt ' or fmt_size != 16
+                or audio_format != 1 or data_id != b'data' or block_align == 0 or framerate == 0):
+            return None
+        return channels, bits // 8, framerate, data_size // block_align
+    
     def validate_wav_file(self, wav_file):
         """WAVファイルの妥当性をチェック"""
         try:
-            with wave.open(wav_file, 'rb') as wf:
-                # ファイル情報を取得
-                channels = wf.getnchannels()
-                sample_width = wf.getsampwidth()
-                framerate = wf.getframerate()
-                frames = wf.getnframes()
-                duration = frames / float(framerate)
-                
-                print(f"WAVファイル情報:")
-                print(f"  チャンネル数: {channels}")
-                print(f"  サンプル幅: {sample_width} bytes")
-                print(f"  サンプルレート: {framerate} Hz")
-                print(f"  長さ: {duration:.2f} 秒")
-                
-                # ファイルサイズチェック（25MB制限）
-                file_size = os.path.getsize(wav_file)
-                if file_size > 25 * 1024 * 1024:
-                    return False, f"ファイルサイズが大きすぎます: {file_size / (1024*1024):.1f}MB（上限: 25MB）"
-                
-                return True, "WAVファイルは有効です"
-                
+            # 標準的なヘッダーなら直接解析し、それ以外はwaveモジュールで読む
+            header = self.read_wav_header(wav_file)
+            if header is None:
+                import wave
+                with wave.open(wav_file, 'rb') as wf:
+                    header = (wf.getnchannels(), wf.getsampwidth(), wf.getframerate(), wf.getnframes())
+            channels, sample_width, framerate, frames = header
+            duration = frames / float(framerate)
+            
+            logger.debug("WAVファイル情報: チャンネル数=%d, サンプル幅=%d bytes, サンプルレート=%d Hz, 長さ=%.2f 秒",
+                         channels, sample_width, framerate, duration)
+            
+            # 長さチェックはヘッダーだけで行い、音声データを読む前に弾く
+            if frames == 0:
+                return False, "WAVファイルに音声データがありません"
+            if duration > MAX_WAV_SECONDS:
+                return False, (f"音声が長すぎます: {duration / 3600:.1f}時間"
+                               f"（上限: {MAX_WAV_SECONDS / 3600:.0f}時間）。分割してから処理してください。")
+            
+            return True, "WAVファイルは有効です"
         except Exception as e:
             return False, f"WAVファイルの読み込みエラー: {e}"
     
-    def transcribe_english_with_timestamps(self, audio_file):
-        """英語音声をタイムスタンプ付きで認識"""
-        if self.client is None:
+    def transcribe_english_with_timestamps(self, audio_file, progress_callback=None):
+        """英語音声をタイムスタンプ付きで認識（長い音声もチャンク単位で認識するためアップロード上限を超えない）"""
+        if self.stt_engine == "openai" and self.client is None:
             return "OpenAI APIキーが設定されていません"
         
         # WAVファイルの妥当性チェック
@@ -85,13 +375,110 @@ class EnglishToJapaneseSubtitle:
         if not is_valid:
             return message
         
+        # 同じ内容のWAVを認識済みならキャッシュから返す
+        cache_path = self.get_transcript_cache_path(audio_file)
+        cached = self.load_cached_transcript(cache_path)
+        if cached is not None:
+            return cached
+        
         try:
-            with open(audio_file, "rb") as audio:
+            segments = []
+            for chunk_segments in self.iter_transcribed_chunks(audio_file, progress_callback):
+                segments.extend(chunk_segments)
+        except Exception as e:
+            return f"英語音声認識エラー: {e}"
+        
+        result = self.build_transcription_result(audio_file, segments)
+        self.save_cached_transcript(cache_path, result)
+        return result
+    
+    def build_transcription_result(self, audio_file, segments):
+        """チャンクごとの認識結果を時刻順に並べ、全体の認識結果を作成"""
+        import wave
+        with wave.open(audio_file, 'rb') as wf:
+            duration = wf.getnframes() / float(wf.getframerate())
+        segments.sort(key=lambda segment: segment['start'])
+        return {
+            'text': " ".join(segment['text'].strip() for segment in segments),
+            'language': 'english',
+            'duration': duration,
+            'segments': segments
+        }
+    
+    def compress_for_upload(self, audio_file):
+        """アップロード用に16kHz以下のモノラルFLACへ圧縮し、一時ファイルのパスを返す（numpy・scipy・soundfile未導入時はNone）"""
+        try:
+            from math import ceil, gcd
+            import numpy as np
+            import soundfile as sf
+            from scipy.signal import resample_poly
+        except ImportError:
+            return None
+        
+        import wave
+        dtypes = {1: np.uint8, 2: np.int16, 4: np.int32}
+        with wave.open(audio_file, 'rb') as wf:
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            framerate = wf.getframerate()
+            total_frames = wf.getnframes()
+            if sample_width not in dtypes:
+                return None
+            
+            def read_mono(start, count):
+                """指定範囲のPCMを読み込み、-1.0〜1.0のモノラルに変換（8bit WAVは符号なし）"""
+                wf.setpos(start)
+                data = np.frombuffer(wf.readframes(count), dtype=dtypes[sample_width]).astype(np.float32)
+                if sample_width == 1:
+                    data -= 128
+                data /= float(2 ** (8 * sample_width - 1))
+                return data.reshape(-1, channels).mean(axis=1)
+            
+            # 16kHzを超える場合はダウンサンプリング（up/downの比で変換）
+            target_rate = min(framerate, UPLOAD_SAMPLE_RATE)
+            divisor = gcd(target_rate, framerate)
+            up, down = target_rate // divisor, framerate // divisor
+            # ブロック長と前後の余白はdownの倍数にし、変換後のサンプル数が整数になるようにする
+            # （余白はresample_polyのフィルタ長の半分以上取り、ブロックの境目でも全体を一括変換した場合と同じ結果にする）
+            block_frames = max(1, framerate * AUDIO_BLOCK_SECONDS // down) * down
+            context = (ceil(10 * max(up, down) / up) // down + 1) * down
+            
+            with tempfile.NamedTemporaryFile(suffix='.flac', delete=False) as f:
+                flac_path = f.name
+            try:
+                with sf.SoundFile(flac_path, 'w', target_rate, 1, format='FLAC', subtype='PCM_16') as flac:
+                    for start in range(0, total_frames, block_frames):
+                        count = min(block_frames, total_frames - start)
+                        if up == down:
+                            data = read_mono(start, count)
+                        else:
+                            before = min(context, start)
+                            after = min(context, total_frames - start - count)
+                            data = resample_poly(read_mono(start - before, before + count + after), up, down)
+                            skip = before * up // down
+                            data = data[skip:skip + ceil(count * up / down)]
+                        flac.write(np.clip(data, -1.0, 1.0))
+            except Exception:
+                os.remove(flac_path)
+                raise
+        return flac_path
+    
+    def request_transcription(self, audio_file):
+        """Whisper APIで音声を認識し、結果を辞書形式で返す"""
+        # 元のWAVはそのままに、圧縮したFLACがあればそちらを送る
+        flac_path = self.compress_for_upload(audio_file)
+        try:
+            # サイズ上限（25MB）は実際に送るファイルに対してチェックする
+            upload_path = flac_path or audio_file
+            file_size = os.path.getsize(upload_path)
+            if file_size > MAX_UPLOAD_BYTES:
+                raise ValueError(f"ファイルサイズが大きすぎます: {file_size / (1024*1024):.1f}MB（上限: 25MB）")
+            with open(upload_path, "rb") as audio:
                 # 新しいAPIバージョンと古いバージョンに対応
                 try:
                     # 新しいAPI（timestamp_granularities対応）を試す
                     transcript = self.client.audio.transcriptions.create(
-                        model="whisper-1",
+                        model=WHISPER_MODEL,
                         file=audio,
                         language="en",
                         response_format="verbose_json",
@@ -101,33 +488,317 @@ class EnglishToJapaneseSubtitle:
                     # 古いAPI（timestamp_granularities未対応）にフォールバック
                     audio.seek(0)  # ファイルポインタをリセット
                     transcript = self.client.audio.transcriptions.create(
-                        model="whisper-1",
+                        model=WHISPER_MODEL,
                         file=audio,
                         language="en",
                         response_format="verbose_json"
                     )
+        finally:
+            if flac_path:
+                os.remove(flac_path)
+        
+        # セグメント情報を含む結果を返す
+        segments = getattr(transcript, 'segments', None) or []
+        return {
+            'text': transcript.text,
+            'language': transcript.language,
+            'duration': transcript.duration,
+            'segments': [self.segment_to_dict(segment) for segment in segments]
+        }
+    
+    def detect_voiced_regions(self, audio_file):
+        """WebRTC VADで発話区間を検出し、(開始フレーム, 終了フレーム) のリストを返す（webrtcvad未導入時はNone）"""
+        import warnings
+        try:
+            import webrtcvad
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                import audioop
+        except ImportError:
+            return None
+        
+        import wave
+        vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+        frame_bytes = VAD_SAMPLE_RATE * VAD_FRAME_MS // 1000 * 2
+        voiced_flags = []
+        with wave.open(audio_file, 'rb') as wf:
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            framerate = wf.getframerate()
+            total_frames = wf.getnframes()
+            if channels > 2:
+                return None
             
-            # セグメント情報を含む結果を返す
-            result = {
-                'text': transcript.text,
-                'language': transcript.language,
-                'duration': transcript.duration,
-                'segments': transcript.segments if hasattr(transcript, 'segments') else []
-            }
-            
-            return result
-        except Exception as e:
-            return f"英語音声認識エラー: {e}"
+            # ブロックごとに読み込み、VADが扱える16bitモノラル・16kHzに変換して判定
+            # （リサンプリングの状態はブロック間で引き継ぎ、VADのフレームに満たない端数は次に回す）
+            ratecv_state = None
+            pending = b""
+            while True:
+                pcm = wf.readframes(framerate * AUDIO_BLOCK_SECONDS)
+                if not pcm:
+                    break
+                if sample_width == 1:
+                    pcm = audioop.bias(pcm, 1, -128)  # 8bit WAVは符号なし
+                if sample_width != 2:
+                    pcm = audioop.lin2lin(pcm, sample_width, 2)
+                if channels == 2:
+                    pcm = audioop.tomono(pcm, 2, 0.5, 0.5)
+                if framerate != VAD_SAMPLE_RATE:
+                    pcm, ratecv_state = audioop.ratecv(pcm, 2, 1, framerate, VAD_SAMPLE_RATE, ratecv_state)
+                pending += pcm
+                usable = len(pending) - len(pending) % frame_bytes
+                voiced_flags.extend(vad.is_speech(pending[i:i + frame_bytes], VAD_SAMPLE_RATE)
+                                    for i in range(0, usable, frame_bytes))
+                pending = pending[usable:]
+        
+        # 発話フレームの前後に余白を付け、重なる区間は1つにまとめる
+        # （区間の間の短い無音はチャンクの切れ目の候補として残し、get_chunk_windowsでまとめる）
+        padding = VAD_PADDING_MS // VAD_FRAME_MS
+        regions = []
+        for i, voiced in enumerate(voiced_flags):
+            if not voiced:
+                continue
+            start = max(0, i - padding)
+            end = min(len(voiced_flags), i + 1 + padding)
+            if regions and start <= regions[-1][1]:
+                regions[-1][1] = end
+            else:
+                regions.append([start, end])
+        
+        # VADのフレーム番号を元のWAVのフレーム番号に換算
+        frames_per_vad_frame = framerate * VAD_FRAME_MS / 1000
+        return [(int(start * frames_per_vad_frame), min(total_frames, int(end * frames_per_vad_frame)))
+                for start, end in regions]
     
-    def translate_to_japanese(self, english_text, context="subtitle"):
-        """英語テキストを日本語に翻訳"""
-        if self.client is None:
+    def get_chunk_windows(self, audio_file):
+        """WAVの発話区間を、発話の切れ目で区切った重なりのないチャンクにまとめる範囲を計算"""
+        import wave
+        with wave.open(audio_file, 'rb') as wf:
+            framerate = wf.getframerate()
+            total_frames = wf.getnframes()
+        
+        # 無音区間はアップロードしない（発話が検出できない場合は全体を対象にする）
+        regions = self.detect_voiced_regions(audio_file) or [(0, total_frames)]
+        
+        # 短い無音を挟む区間はCHUNK_SECONDSまで同じチャンクにまとめ、長い無音は送らない
+        # （息継ぎ程度の間で区切ると短いクリップが大量にでき、認識精度が落ちリクエスト数も増えるため）
+        chunk_frames = int(CHUNK_SECONDS * framerate)
+        min_silence_frames = int(VAD_MIN_SILENCE_MS * framerate / 1000)
+        packed = []
+        for region_start, region_end in regions:
+            if (packed and region_start - packed[-1][1] < min_silence_frames
+                    and region_end - packed[-1][0] <= chunk_frames):
+                packed[-1][1] = region_end
+            else:
+                packed.append([region_start, region_end])
+        
+        # 切れ目のないままCHUNK_SECONDSを超える発話のみ一定長で分割する
+        # （チャンク同士は重ならないため、同じ音声が2回認識されることはない）
+        windows = []
+        for packed_start, packed_end in packed:
+            for start in range(packed_start, packed_end, chunk_frames):
+                end = min(start + chunk_frames, packed_end)
+                windows.append({
+                    'start_frame': start,
+                    'frames': end - start,
+                    'offset': start / framerate,
+                    'end_time': end / framerate
+                })
+        return windows, total_frames / float(framerate)
+    
+    def transcribe_chunk(self, audio_file, window):
+        """WAVの一部を切り出して認識し、全体の時刻に換算したセグメントを返す"""
+        import wave
+        with wave.open(audio_file, 'rb') as wf:
+            params = wf.getparams()
+            wf.setpos(window['start_frame'])
+            frames = wf.readframes(window['frames'])
+        
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+            chunk_path = f.name
+        try:
+            with wave.open(chunk_path, 'wb') as chunk:
+                chunk.setparams(params)
+                chunk.writeframes(frames)
+            result = self.request_transcription(chunk_path)
+        finally:
+            os.remove(chunk_path)
+        
+        segments = []
+        for segment in result['segments']:
+            # 時刻がチャンクの範囲をはみ出さないよう切り詰める（隣のチャンクの字幕と重ならないようにする）
+            start = min(max(segment['start'] + window['offset'], window['offset']), window['end_time'])
+            end = min(max(segment['end'] + window['offset'], start), window['end_time'])
+            segments.append({'start': start, 'end': end, 'text': segment['text']})
+        return segments
+    
+    def clean_segment_text(self, text):
+        """認識結果のテキストから効果音の注記と余分な空白を除去"""
+        return WHITESPACE_PATTERN.sub(" ", FILLER_PATTERN.sub("", text or "")).strip()
+    
+    def emit_translations(self, japanese_texts, on_token):
+        """翻訳済みの字幕を途中経過として通知"""
+        if on_token:
+            on_token("".join(f"{japanese_text}\n\n" for japanese_text in japanese_texts))
+    
+    def iter_transcribed_chunks(self, audio_file, progress_callback=None):
+        """音声を認識し、認識できたセグメントをまとまりごとに順次返す"""
+        if self.stt_engine == "local":
+            # faster-whisperは逐次セグメントを返すため、一括翻訳の単位ごとに区切って返す
+            segments, duration = self.get_local_transcriber().transcribe(audio_file)
+            buffer = []
+            for segment in segments:
+                buffer.append(segment)
+                if len(buffer) >= BATCH_SIZE:
+                    if progress_callback:
+                        progress_callback(f"英語音声を認識・翻訳中... ({segment['end']:.0f}/{duration:.0f}秒)")
+                    yield buffer
+                    buffer = []
+            if buffer:
+                yield buffer
+            return
+        
+        windows, _ = self.get_chunk_windows(audio_file)
+        with ThreadPoolExecutor(max_workers=TRANSCRIPTION_WORKERS) as stt_executor:
+            stt_futures = [stt_executor.submit(self.transcribe_chunk, audio_file, window)
+                           for window in windows]
+            try:
+                for done, future in enumerate(as_completed(stt_futures), 1):
+                    chunk_segments = future.result()
+                    if progress_callback:
+                        progress_callback(f"英語音声を認識・翻訳中... ({done}/{len(windows)})")
+                    yield chunk_segments
+            finally:
+                for pending in stt_futures:
+                    pending.cancel()
+    
+    def transcribe_and_translate(self, audio_file, progress_callback=None, on_token=None):
+        """チャンク単位で音声認識し、認識できたものから順に翻訳を開始"""
+        if self.stt_engine == "openai" and self.client is None:
             return "OpenAI APIキーが設定されていません"
         
+        # WAVファイルの妥当性チェック
+        is_valid, message = self.validate_wav_file(audio_file)
+        if not is_valid:
+            return message
+        
+        # 認識済みならキャッシュを使い、翻訳のみ行う
+        cache_path = self.get_transcript_cache_path(audio_file)
+        cached = self.load_cached_transcript(cache_path)
+        if cached is not None:
+            return cached, self.create_subtitle_segments(cached, on_token=on_token)
+        
+        segments = []
+        subtitle_segments = []
+        translation_futures = []
+        try:
+            for chunk_segments in self.iter_transcribed_chunks(audio_file, progress_callback):
+                segments.extend(chunk_segments)
+                # 認識できたチャンクの翻訳を、残りの認識と並行して開始（空・雑音のみのものは翻訳しない）
+                indexed_segments = []
+                for segment in chunk_segments:
+                    english_text = self.clean_segment_text(segment['text'])
+                    if english_text:
+                        indexed_segments.append((segment, english_text))
+                # キャッシュ済みの訳文はその場で確定し、未翻訳分だけを翻訳に回す
+                japanese_texts, to_translate = self.lookup_cached_translations(
+                    [english_text for _, english_text in indexed_segments])
+                cached_hits = [(indexed_segments[i], japanese_text)
+                               for i, japanese_text in enumerate(japanese_texts) if japanese_text is not None]
+                if cached_hits:
+                    self.emit_translations([japanese_text for _, japanese_text in cached_hits], on_token)
+                for (segment, english_text), japanese_text in cached_hits:
+                    subtitle_segments.append({
+                        'start': segment['start'],
+                        'end': segment['end'],
+                        'english': english_text,
+                        'japanese': japanese_text
+                    })
+                pending_segments = [indexed_segments[i] for i in to_translate]
+                offset = 0
+                for texts in self.chunk_texts([english_text for _, english_text in pending_segments]):
+                    translation_future = self.run_async(self.translate_batch_async(texts, on_token))
+                    translation_futures.append((pending_segments[offset:offset + len(texts)], translation_future))
+                    offset += len(texts)
+        except Exception as e:
+            return f"英語音声認識エラー: {e}"
+        
+        for batch_segments, future in translation_futures:
+            for (segment, english_text), japanese_text in zip(batch_segments, future.result()):
+                subtitle_segments.append({
+                    'start': segment['start'],
+                    'end': segment['end'],
+                    'english': english_text,
+                    'japanese': japanese_text
+                })
+        
+        subtitle_segments.sort(key=lambda segment: segment['start'])
+        transcription_result = self.build_transcription_result(audio_file, segments)
+        self.save_cached_transcript(cache_path, transcription_result)
+        
+        if not subtitle_segments:
+            # セグメント情報がない場合は全体を翻訳
+            subtitle_segments = self.create_subtitle_segments(transcription_result, on_token=on_token)
+        return transcription_result, subtitle_segments
+    
+    def lookup_cached_translations(self, english_texts):
+        """キャッシュ済みの訳文を引き当て、訳文のリスト（未翻訳はNone）と未翻訳分のインデックスを返す"""
+        japanese_texts = [self.translation_cache.get(self.get_cache_key(text)) for text in english_texts]
+        to_translate = [i for i, japanese_text in enumerate(japanese_texts) if japanese_text is None]
+        self.cache_lookup_count += len(english_texts)
+        self.cache_hit_count += len(english_texts) - len(to_translate)
+        return japanese_texts, to_translate
+    
+    def get_cache_hit_ratio(self):
+        """翻訳キャッシュのヒット率を返す（照会がなければNone）"""
+        if not self.cache_lookup_count:
+            return None
+        return self.cache_hit_count / self.cache_lookup_count
+    
+    def segment_to_dict(self, segment):
+        """認識結果のセグメントを辞書形式に変換"""
+        defaults = {'start': 0, 'end': 0, 'text': ''}
+        if isinstance(segment, dict):
+            return {key: segment.get(key, default) for key, default in defaults.items()}
+        return {key: getattr(segment, key, default) for key, default in defaults.items()}
+    
+    def get_transcript_cache_path(self, audio_file):
+        """WAVファイルの内容のSHA-256から認識結果キャッシュのパスを作成"""
+        sha256 = hashlib.sha256()
+        with open(audio_file, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(block)
+        # モデルが変われば別ファイルになるようファイル名に含める
+        if self.stt_engine == "local":
+            model = f"faster-whisper-{LOCAL_WHISPER_MODEL}"
+        else:
+            model = WHISPER_MODEL
+        return os.path.join(TRANSCRIPT_CACHE_DIR, f"{model}-{sha256.hexdigest()}.json")
+    
+    def load_cached_transcript(self, cache_path):
+        """認識結果をキャッシュから読み込み（なければNone）"""
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("認識結果キャッシュ読み込みエラー: %s", e)
+            return None
+    
+    def save_cached_transcript(self, cache_path, result):
+        """認識結果をキャッシュに保存"""
         try:
-            # 翻訳用プロンプト
-            if context == "subtitle":
-                system_prompt = """あなたは映像字幕の専門翻訳者です。以下の英語テキストを自然で読みやすい日本語字幕に翻訳してください。
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning("認識結果キャッシュ書き込みエラー: %s", e)
+    
+    def get_system_prompt(self, context="subtitle"):
+        """翻訳用のシステムプロンプトを取得"""
+        if context == "subtitle":
+            return """あなたは映像字幕の専門翻訳者です。以下の英語テキストを自然で読みやすい日本語字幕に翻訳してください。
 
 翻訳の際の注意事項：
 - 字幕として読みやすい自然な日本語にする
@@ -136,23 +807,313 @@ class EnglishToJapaneseSubtitle:
 - 専門用語は日本語で一般的な表現を使用
 - 長すぎる文は適切に分割する
 """
+        return "以下の英語テキストを自然な日本語に翻訳してください。"
+    
+    def create_chat_completion(self, **kwargs):
+        """Chat APIを呼び出し（レート制限時は指数バックオフでリトライ）"""
+        from openai import RateLimitError
+        for attempt in range(MAX_RETRIES):
+            try:
+                return self.client.chat.completions.create(**kwargs)
+            except RateLimitError:
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                time.sleep(2 ** attempt)
+    
+    async def create_chat_completion_async(self, **kwargs):
+        """Chat APIを非同期で呼び出し（同時実行数を制限し、レート制限時は指数バックオフでリトライ）"""
+        import asyncio
+        from openai import RateLimitError
+        if self.translation_semaphore is None:
+            self.translation_semaphore = asyncio.Semaphore(TRANSLATION_CONCURRENCY)
+        for attempt in range(MAX_RETRIES):
+            try:
+                async with self.translation_semaphore:
+                    return await self.async_client.chat.completions.create(**kwargs)
+            except RateLimitError:
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+    
+    def build_translation_request(self, english_text, context="subtitle", single_cue=True):
+        """1件分の翻訳リクエストのパラメータを作成（同じ入力には同じ訳文が返るよう温度0で生成）"""
+        # 出力長を制限して余計な説明の生成を防ぐ
+        max_tokens = max(MIN_MAX_TOKENS, int(len(english_text) * MAX_TOKENS_PER_CHAR))
+        request = {
+            "model": self.translation_model,
+            "messages": [
+                {"role": "system", "content": self.get_system_prompt(context)},
+                {"role": "user", "content": english_text}
+            ],
+            "temperature": 0,
+            "top_p": 1
+        }
+        if single_cue:
+            # 字幕1件の訳が複数段落に膨らまないよう打ち切る
+            request["max_tokens"] = min(MAX_CUE_TOKENS, max_tokens)
+            request["stop"] = ["\n\n"]
+        else:
+            request["max_tokens"] = max_tokens
+        return request
+    
+    def get_cache_key(self, english_text, context="subtitle"):
+        """翻訳キャッシュのキーを作成"""
+        if self.translation_engine == "local":
+            model = LOCAL_TRANSLATION_MODEL
+        else:
+            model = self.translation_model
+        return self.translation_cache.make_key(english_text, model, self.get_system_prompt(context))
+    
+    def get_local_translator(self):
+        """ローカル翻訳モデルを取得（初回のみ読み込み）"""
+        if self.local_translator is None:
+            self.local_translator = LocalTranslator()
+        return self.local_translator
+    
+    def translate_locally(self, texts):
+        """ローカル翻訳モデルで翻訳（キャッシュに保存）"""
+        japanese_texts = self.get_local_translator().translate_batch(texts)
+        self.translation_cache.put_many([(self.get_cache_key(text), japanese_text)
+                                         for text, japanese_text in zip(texts, japanese_texts)])
+        return japanese_texts
+    
+    def translate_to_japanese(self, english_text, context="subtitle", on_token=None, single_cue=True):
+        """英語テキストを日本語に翻訳（on_token指定時は生成途中の文字列を逐次通知）"""
+        cache_key = self.get_cache_key(english_text, context)
+        cached = self.translation_cache.get(cache_key)
+        if cached is not None:
+            if on_token:
+                on_token(cached)
+            return cached
+        
+        if self.translation_engine == "local":
+            japanese_text = self.translate_locally([english_text])[0]
+            if on_token:
+                on_token(japanese_text)
+            return japanese_text
+        
+        if self.client is None:
+            return "OpenAI APIキーが設定されていません"
+        
+        try:
+            request = self.build_translation_request(english_text, context, single_cue)
+            if on_token:
+                # ストリーミングで受信し、届いた分から表示する
+                response = self.create_chat_completion(stream=True, **request)
+                tokens = []
+                for chunk in response:
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        tokens.append(token)
+                        on_token(token)
+                japanese_text = "".join(tokens).strip()
             else:
-                system_prompt = "以下の英語テキストを自然な日本語に翻訳してください。"
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": english_text}
-                ],
-                temperature=0.3
-            )
-            
-            return response.choices[0].message.content.strip()
+                response = self.create_chat_completion(**request)
+                japanese_text = response.choices[0].message.content.strip()
+            self.translation_cache.put(cache_key, japanese_text)
+            return japanese_text
         except Exception as e:
             return f"翻訳エラー: {e}"
     
-    def create_subtitle_segments(self, transcription_result):
+    async def translate_single_async(self, english_text):
+        """英語テキスト1件を非同期で翻訳（キャッシュに保存）"""
+        import asyncio
+        try:
+            response = await self.create_chat_completion_async(**self.build_translation_request(english_text))
+            japanese_text = response.choices[0].message.content.strip()
+            # SQLiteへの書き込みでイベントループを止めないよう別スレッドで行う
+            await asyncio.to_thread(self.translation_cache.put, self.get_cache_key(english_text), japanese_text)
+            return japanese_text
+        except Exception as e:
+            return f"翻訳エラー: {e}"
+    
+    def translate_batch(self, texts):
+        """複数の英語テキストを1回のリクエストでまとめて翻訳（キャッシュ済みのものは呼び出し側で除いておく）"""
+        return self.run_async(self.translate_batch_async(texts)).result()
+    
+    async def translate_batch_async(self, texts, on_token=None):
+        """複数の英語テキストを1回のリクエストでまとめて非同期で翻訳（キャッシュの参照は呼び出し側で事前に行う）"""
+        import asyncio
+        if self.translation_engine == "local":
+            results = await asyncio.to_thread(self.translate_locally, texts)
+        else:
+            results = await self.request_batch_translation_async(texts)
+        self.emit_translations(results, on_token)
+        return results
+    
+    async def translate_chunks_async(self, chunks, on_token=None):
+        """チャンクごとの一括翻訳を並行して実行し、結果を元の順序でまとめて返す"""
+        import asyncio
+        translated_chunks = await asyncio.gather(*[self.translate_batch_async(texts, on_token) for texts in chunks])
+        return [japanese_text for translated in translated_chunks for japanese_text in translated]
+    
+    async def request_batch_translation_async(self, texts):
+        """複数の英語テキストを1回のAPIリクエストで翻訳（キャッシュに保存）"""
+        import asyncio
+        if self.async_client is None:
+            return ["OpenAI APIキーが設定されていません"] * len(texts)
+        if len(texts) == 1:
+            return [await self.translate_single_async(texts[0])]
+        
+        # {"1": "...", "2": "..."} 形式で送信し、同じキーで訳文を返してもらう
+        numbered = {str(i): text for i, text in enumerate(texts, 1)}
+        system_prompt = self.get_system_prompt() + """
+入力は番号をキーとするJSONオブジェクトです。
+各値を個別に翻訳し、同じキーに日本語訳を入れたJSONオブジェクトのみを出力してください。
+"""
+        request = {
+            "model": self.translation_model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": json.dumps(numbered, ensure_ascii=False)}
+            ],
+            "temperature": 0,
+            "top_p": 1,
+            # キーや引用符の分も見込んで出力長を制限
+            "max_tokens": sum(max(MIN_MAX_TOKENS, int(len(text) * MAX_TOKENS_PER_CHAR)) for text in texts)
+        }
+        if self.translation_model not in JSON_MODE_UNSUPPORTED_MODELS:
+            request["response_format"] = {"type": "json_object"}
+        try:
+            response = await self.create_chat_completion_async(**request)
+        except Exception as e:
+            # APIエラー（リトライ後のレート制限・認証・通信エラー）は個別に再送せずエラーとして返す
+            return [f"翻訳エラー: {e}"] * len(texts)
+        
+        try:
+            content = response.choices[0].message.content or ""
+            # コードブロック等で囲まれている場合に備えてJSON部分のみ取り出す
+            translated = json.loads(content[content.index("{"):content.rindex("}") + 1])
+            results = [str(translated[str(i)]).strip() for i in range(1, len(texts) + 1)]
+        except (ValueError, KeyError, TypeError) as e:
+            # 応答の解析に失敗した場合のみ1件ずつ並行して翻訳
+            logger.warning("一括翻訳の応答を解析できません（個別翻訳に切り替え）: %s", e)
+            return list(await asyncio.gather(*[self.translate_single_async(text) for text in texts]))
+        
+        # チャンク分を1回のトランザクションで、イベントループとは別のスレッドで保存
+        await asyncio.to_thread(self.translation_cache.put_many,
+                                [(self.get_cache_key(text), japanese_text)
+                                 for text, japanese_text in zip(texts, results)])
+        return results
+    
+    def chunk_texts(self, texts):
+        """一括翻訳用にテキストをチャンクに分割"""
+        chunks = []
+        current = []
+        current_chars = 0
+        for text in texts:
+            if current and (len(current) >= BATCH_SIZE or current_chars + len(text) > BATCH_MAX_CHARS):
+                chunks.append(current)
+                current = []
+                current_chars = 0
+            current.append(text)
+            current_chars += len(text)
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    def submit_batch_translation(self, texts):
+        """全セグメントの翻訳をBatch APIに一括投入し、バッチIDを返す"""
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8', delete=False) as f:
+            batch_input_path = f.name
+            for i, text in enumerate(texts):
+                request = {
+                    "custom_id": f"seg-{i}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self.build_translation_request(text)
+                }
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        
+        try:
+            with open(batch_input_path, "rb") as f:
+                batch_file = self.client.files.create(file=f, purpose="batch")
+        finally:
+            os.remove(batch_input_path)
+        
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+    
+    def get_pending_batch_path(self, texts):
+        """翻訳するテキスト一式（モデル・プロンプト込み）から、投入済みバッチIDの保存先を作成"""
+        digest = hashlib.sha256("\n".join(self.get_cache_key(text) for text in texts).encode('ascii')).hexdigest()
+        return os.path.join(TRANSCRIPT_CACHE_DIR, f"batch-{digest}.json")
+    
+    def load_pending_batch(self, pending_path):
+        """投入済みで未完了のバッチIDを読み込み（なければNone）"""
+        if not os.path.exists(pending_path):
+            return None
+        try:
+            with open(pending_path, 'r', encoding='utf-8') as f:
+                return json.load(f)['batch_id']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("投入済みバッチの読み込みエラー: %s", e)
+            return None
+    
+    def save_pending_batch(self, pending_path, batch_id):
+        """投入したバッチIDを保存"""
+        try:
+            os.makedirs(os.path.dirname(pending_path), exist_ok=True)
+            with open(pending_path, 'w', encoding='utf-8') as f:
+                json.dump({'batch_id': batch_id}, f)
+        except OSError as e:
+            logger.warning("投入済みバッチの保存エラー: %s", e)
+    
+    def remove_pending_batch(self, pending_path):
+        """完了・終了したバッチIDの記録を削除"""
+        try:
+            os.remove(pending_path)
+        except OSError:
+            pass
+    
+    def wait_for_batch_translation(self, batch_id, texts, progress_callback=None):
+        """Batch APIの完了を待ち、翻訳結果を投入順のリストで返す"""
+        count = len(texts)
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status == "completed":
+                break
+            if batch.status in ("failed", "expired", "cancelled"):
+                raise RuntimeError(f"バッチ翻訳が終了しませんでした（状態: {batch.status}）")
+            
+            if progress_callback:
+                counts = batch.request_counts
+                done = counts.completed if counts else 0
+                progress_callback(f"バッチ翻訳待ち... {done}/{count}（状態: {batch.status}）")
+            time.sleep(BATCH_POLL_INTERVAL)
+        
+        results = {}
+        if batch.output_file_id:
+            output = self.client.files.content(batch.output_file_id).text
+            for line in output.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get('response') or {}
+                if response.get('status_code') == 200:
+                    content = response['body']['choices'][0]['message']['content']
+                    results[item['custom_id']] = content.strip()
+        
+        japanese_texts = []
+        cache_items = []
+        for i, text in enumerate(texts):
+            japanese_text = results.get(f"seg-{i}")
+            if japanese_text is None:
+                japanese_text = "翻訳エラー: バッチ結果がありません"
+            else:
+                cache_items.append((self.get_cache_key(text), japanese_text))
+            japanese_texts.append(japanese_text)
+        self.translation_cache.put_many(cache_items)
+        return japanese_texts
+    
+    def create_subtitle_segments(self, transcription_result, batch_mode=False, progress_callback=None,
+                                 on_token=None):
         """音声認識結果から字幕セグメントを作成"""
         if isinstance(transcription_result, str):
             return transcription_result
@@ -161,7 +1122,8 @@ class EnglishToJapaneseSubtitle:
         if not segments:
             # セグメント情報がない場合は全体を翻訳
             english_text = transcription_result.get('text', '')
-            japanese_text = self.translate_to_japanese(english_text)
+            # 全文は複数段落になり得るため字幕1件用の上限・停止条件は使わない
+            japanese_text = self.translate_to_japanese(english_text, on_token=on_token, single_cue=False)
             return [{
                 'start': 0,
                 'end': transcription_result.get('duration', 0),
@@ -169,59 +1131,106 @@ class EnglishToJapaneseSubtitle:
                 'japanese': japanese_text
             }]
         
-        subtitle_segments = []
+        # 空・雑音のみでないセグメントを抽出（元の順序を保持）
+        indexed_segments = []
         for segment in segments:
-            english_text = segment.get('text', '').strip()
+            english_text = self.clean_segment_text(segment.get('text', ''))
             if english_text:
-                japanese_text = self.translate_to_japanese(english_text)
-                subtitle_segments.append({
-                    'start': segment.get('start', 0),
-                    'end': segment.get('end', 0),
-                    'english': english_text,
-                    'japanese': japanese_text
-                })
+                indexed_segments.append((segment, english_text))
+        
+        english_texts = [english_text for _, english_text in indexed_segments]
+        # キャッシュ済みの訳文はその場で確定し、未翻訳分だけを翻訳に回す
+        japanese_texts, to_translate = self.lookup_cached_translations(english_texts)
+        cached_hits = [japanese_text for japanese_text in japanese_texts if japanese_text is not None]
+        if cached_hits:
+            self.emit_translations(cached_hits, on_token)
+        
+        missing_texts = [english_texts[i] for i in to_translate]
+        if not missing_texts:
+            translated = []
+        elif self.translation_engine == "local":
+            # ローカルモデルでまとめて推論（API呼び出しなし）
+            translated = []
+            for i in range(0, len(missing_texts), LOCAL_TRANSLATION_BATCH_SIZE):
+                translated_batch = self.translate_batch(missing_texts[i:i + LOCAL_TRANSLATION_BATCH_SIZE])
+                self.emit_translations(translated_batch, on_token)
+                translated.extend(translated_batch)
+        elif batch_mode:
+            # Batch APIで非同期に翻訳（低コスト・完了まで時間がかかる）
+            # 投入済みのバッチIDは保存しておき、途中でアプリを閉じても同じ内容なら続きから待つ
+            pending_path = self.get_pending_batch_path(missing_texts)
+            batch_id = self.load_pending_batch(pending_path)
+            if batch_id is None:
+                batch_id = self.submit_batch_translation(missing_texts)
+                self.save_pending_batch(pending_path, batch_id)
+            elif progress_callback:
+                progress_callback(f"前回投入したバッチ翻訳を再開します（{batch_id}）")
+            try:
+                translated = self.wait_for_batch_translation(batch_id, missing_texts, progress_callback)
+            except RuntimeError:
+                # 失敗・期限切れ・取り消しで終了したバッチは再開できない
+                self.remove_pending_batch(pending_path)
+                raise
+            self.remove_pending_batch(pending_path)
+        else:
+            # チャンク単位で一括翻訳し、チャンク同士は非同期で並行実行
+            translated = self.run_async(
+                self.translate_chunks_async(self.chunk_texts(missing_texts), on_token)).result()
+        # 翻訳結果を元の順序の位置に戻す
+        for i, japanese_text in zip(to_translate, translated):
+            japanese_texts[i] = japanese_text
+        
+        subtitle_segments = []
+        for (segment, english_text), japanese_text in zip(indexed_segments, japanese_texts):
+            subtitle_segments.append({
+                'start': segment.get('start', 0),
+                'end': segment.get('end', 0),
+                'english': english_text,
+                'japanese': japanese_text
+            })
         
         return subtitle_segments
     
     def format_time_srt(self, seconds):
         """秒数をSRT形式のタイムスタンプに変換"""
-        td = timedelta(seconds=seconds)
-        hours = int(td.total_seconds() // 3600)
-        minutes = int((td.total_seconds() % 3600) // 60)
-        secs = int(td.total_seconds() % 60)
-        millisecs = int((td.total_seconds() % 1) * 1000)
+        # ミリ秒の整数に丸めてから divmod で各桁を取り出す（切り捨てると浮動小数点誤差で1ミリ秒ずれる）
+        millisecs = round(seconds * 1000)
+        hours, millisecs = divmod(millisecs, 3_600_000)
+        minutes, millisecs = divmod(millisecs, 60_000)
+        secs, millisecs = divmod(millisecs, 1000)
         return f"{hours:02d}:{minutes:02d}:{secs:02d},{millisecs:03d}"
     
+    def format_cue_srt(self, i, segment):
+        """SRT形式の字幕1件分を作成"""
+        return (f"{i}\n{self.format_time_srt(segment['start'])} --> {self.format_time_srt(segment['end'])}\n"
+                f"{segment['japanese']}\n\n")
+    
+    def format_cue_bilingual(self, i, segment):
+        """英日対訳の字幕1件分を作成"""
+        return (f"[{i:03d}] {self.format_time_display(segment['start'])} - {self.format_time_display(segment['end'])}\n"
+                f"EN: {segment['english']}\n"
+                f"JA: {segment['japanese']}\n"
+                + "-" * 40 + "\n\n")
+    
+    def format_cue_japanese(self, i, segment):
+        """日本語のみの字幕1件分を作成"""
+        return f"{i:02d}. {segment['japanese']}\n\n"
+    
+    def generate_bilingual_header(self):
+        """英日対訳テキストの見出しを作成"""
+        return ("=" * 60 + "\n"
+                "英語音声 → 日本語字幕\n"
+                f"生成日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                + "=" * 60 + "\n\n")
+    
     def generate_srt_content(self, subtitle_segments):
         """SRT形式の字幕コンテンツを生成"""
-        srt_content = ""
-        for i, segment in enumerate(subtitle_segments, 1):
-            start_time = self.format_time_srt(segment['start'])
-            end_time = self.format_time_srt(segment['end'])
-            
-            srt_content += f"{i}\n"
-            srt_content += f"{start_time} --> {end_time}\n"
-            srt_content += f"{segment['japanese']}\n\n"
-        
-        return srt_content
+        return "".join(self.format_cue_srt(i, segment) for i, segment in enumerate(subtitle_segments, 1))
     
     def generate_bilingual_text(self, subtitle_segments):
         """英日対訳テキストを生成"""
-        text_content = "=" * 60 + "\n"
-        text_content += "英語音声 → 日本語字幕\n"
-        text_content += f"生成日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-        text_content += "=" * 60 + "\n\n"
-        
-        for i, segment in enumerate(subtitle_segments, 1):
-            start_time = self.format_time_display(segment['start'])
-            end_time = self.format_time_display(segment['end'])
-            
-            text_content += f"[{i:03d}] {start_time} - {end_time}\n"
-            text_content += f"EN: {segment['english']}\n"
-            text_content += f"JA: {segment['japanese']}\n"
-            text_content += "-" * 40 + "\n\n"
-        
-        return text_content
+        return self.generate_bilingual_header() + "".join(
+            self.format_cue_bilingual(i, segment) for i, segment in enumerate(subtitle_segments, 1))
     
     def format_time_display(self, seconds):
         """表示用のタイムスタンプフォーマット"""
@@ -229,30 +1238,70 @@ class EnglishToJapaneseSubtitle:
         secs = int(seconds % 60)
         return f"{minutes:02d}:{secs:02d}"
     
-    def process_wav_file(self, file_path, progress_callback=None):
-        """WAVファイルを処理して字幕を生成"""
+    def remove_cue_overlaps(self, subtitle_segments):
+        """字幕を時刻順に並べ、次の字幕と重なる場合は終了時刻を次の開始時刻までに切り詰める"""
+        subtitle_segments = sorted(subtitle_segments, key=lambda segment: segment['start'])
+        for current, following in zip(subtitle_segments, subtitle_segments[1:]):
+            if current['end'] > following['start']:
+                logger.debug("字幕の重なりを修正: %.3f-%.3f / %.3f", current['start'], current['end'], following['start'])
+                current['end'] = following['start']
+        return subtitle_segments
+    
+    def process_wav_file(self, file_path, progress_callback=None, batch_mode=False, on_token=None):
+        """WAVファイルを処理して字幕を生成（on_tokenには翻訳結果が届き次第通知）"""
         try:
             if progress_callback:
                 progress_callback("WAVファイルを確認中...")
+            self.cache_hit_count = 0
+            self.cache_lookup_count = 0
             
             # WAVファイルの拡張子チェック
             if not file_path.lower().endswith('.wav'):
                 return "WAVファイルのみ対応しています。他の形式は事前にWAVに変換してください。"
             
-            if progress_callback:
-                progress_callback("英語音声を認識中...")
-            
-            # 英語音声認識（タイムスタンプ付き）
-            transcription_result = self.transcribe_english_with_timestamps(file_path)
+            if self.translation_engine == "local":
+                # ローカル翻訳ではBatch APIは使わない
+                batch_mode = False
+            if self.translation_engine == "local" and self.local_translator is None:
+                if progress_callback:
+                    progress_callback("ローカル翻訳モデルを読み込み中...")
+                self.get_local_translator()
+            if self.stt_engine == "local" and self.local_transcriber is None:
+                if progress_callback:
+                    progress_callback("ローカル音声認識モデルを読み込み中...")
+                self.get_local_transcriber()
             
-            if isinstance(transcription_result, str):
-                return transcription_result
+            if batch_mode:
+                if progress_callback:
+                    progress_callback("英語音声を認識中...")
+                
+                # 英語音声認識（タイムスタンプ付き、チャンク単位）。Batch APIには翻訳だけを投入する
+                transcription_result = self.transcribe_english_with_timestamps(file_path, progress_callback)
+                
+                if isinstance(transcription_result, str):
+                    return transcription_result
+                
+                if progress_callback:
+                    progress_callback("Batch APIに翻訳を投入中...")
+                
+                # 字幕セグメント作成（翻訳含む）
+                subtitle_segments = self.create_subtitle_segments(transcription_result, batch_mode, progress_callback)
+            else:
+                if progress_callback:
+                    progress_callback("英語音声を認識・翻訳中...")
+                
+                # 音声認識と翻訳をチャンク単位で並行実行
+                result = self.transcribe_and_translate(file_path, progress_callback, on_token)
+                
+                if isinstance(result, str):
+                    return result
+                
+                transcription_result, subtitle_segments = result
             
-            if progress_callback:
-                progress_callback("日本語に翻訳中...")
+            subtitle_segments = self.remove_cue_overlaps(subtitle_segments)
             
-            # 字幕セグメント作成（翻訳含む）
-            subtitle_segments = self.create_subtitle_segments(transcription_result)
+            # キャッシュヒット分の参照時刻を1回の書き込みで保存
+            self.translation_cache.flush()
             
             if progress_callback:
                 progress_callback("完了！")
@@ -260,7 +1309,9 @@ class EnglishToJapaneseSubtitle:
             return {
                 'segments': subtitle_segments,
                 'original_text': transcription_result.get('text', ''),
-                'duration': transcription_result.get('duration', 0)
+                'duration': transcription_result.get('duration', 0),
+                # 翻訳キャッシュのヒット率（キャッシュを照会しなかった場合はNone）
+                'cache_hit_ratio': self.get_cache_hit_ratio()
             }
             
         except Exception as e:
@@ -268,8 +1319,6 @@ class EnglishToJapaneseSubtitle:
 
 class SubtitleGeneratorGUI:
     def __init__(self):
-        if not IMPORTS_OK:
-            return
         self.config_manager = ConfigManager()
         self.subtitle_gen = EnglishToJapaneseSubtitle()
         self.current_segments = None
@@ -278,6 +1327,9 @@ class SubtitleGeneratorGUI:
     
     def setup_gui(self):
         """GUIをセットアップ"""
+        import tkinter as tk
+        from tkinter import scrolledtext, ttk
+        
         self.root = tk.Tk()
         self.root.title("英語音声→日本語字幕生成ツール（WAV専用）")
         self.root.geometry("1000x800")
@@ -342,6 +1394,30 @@ class SubtitleGeneratorGUI:
         tk.Button(save_frame, text="📄 対訳テキスト保存", 
                  command=self.save_bilingual_text, width=15, bg="#FF9800", fg="white").pack(side=tk.LEFT)
         
+        # 翻訳オプションフレーム
+        option_frame = tk.Frame(main_frame)
+        option_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        tk.Label(option_frame, text="STT:").pack(side=tk.LEFT)
+        self.stt_engine_var = tk.StringVar(value="openai")
+        tk.Radiobutton(option_frame, text="OpenAI Whisper", variable=self.stt_engine_var, 
+                      value="openai").pack(side=tk.LEFT)
+        tk.Radiobutton(option_frame, text="ローカル faster-whisper", variable=self.stt_engine_var, 
+                      value="local").pack(side=tk.LEFT, padx=(0, 10))
+        
+        tk.Label(option_frame, text="翻訳エンジン:").pack(side=tk.LEFT)
+        self.translation_engine_var = tk.StringVar(value="openai")
+        tk.Radiobutton(option_frame, text="OpenAI", variable=self.translation_engine_var, 
+                      value="openai").pack(side=tk.LEFT)
+        tk.Radiobutton(option_frame, text="ローカル(NLLB)", variable=self.translation_engine_var, 
+                      value="local").pack(side=tk.LEFT, padx=(0, 10))
+        self.translation_model_var = tk.StringVar(value=next(iter(TRANSLATION_MODELS)))
+        ttk.Combobox(option_frame, textvariable=self.translation_model_var, 
+                     values=list(TRANSLATION_MODELS), state="readonly", width=22).pack(side=tk.LEFT, padx=(0, 10))
+        self.batch_mode_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(option_frame, text="Batch (安価)", 
+                      variable=self.batch_mode_var).pack(side=tk.LEFT, padx=(0, 10))
+        
         # 注意書き
         note_frame = tk.Frame(main_frame)
         note_frame.pack(fill=tk.X, pady=(0, 10))
@@ -388,9 +1464,33 @@ class SubtitleGeneratorGUI:
         status_bar = tk.Label(self.root, textvariable=self.status_var, 
                              relief=tk.SUNKEN, anchor=tk.W)
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        # 別スレッドからのGUI更新はキューを経由してメインスレッドで実行する
+        self.ui_queue = queue.Queue()
+        self.root.after(UI_POLL_INTERVAL_MS, self.drain_ui_queue)
+    
+    def post_to_ui(self, func, *args):
+        """GUI更新処理をメインスレッドで実行するよう予約（どのスレッドからでも呼べる）"""
+        self.ui_queue.put((func, args))
+    
+    def drain_ui_queue(self):
+        """予約されたGUI更新処理をまとめて実行"""
+        try:
+            while True:
+                func, args = self.ui_queue.get_nowait()
+                try:
+                    func(*args)
+                except Exception as e:
+                    logger.warning("GUI更新エラー: %s", e)
+        except queue.Empty:
+            pass
+        self.root.after(UI_POLL_INTERVAL_MS, self.drain_ui_queue)
     
     def show_conversion_help(self):
         """音声変換ヘルプを表示"""
+        import tkinter as tk
+        from tkinter import scrolledtext
+        
         help_window = tk.Toplevel(self.root)
         help_window.title("音声ファイル変換方法")
         help_window.geometry("600x500")
@@ -458,6 +1558,8 @@ if ($result -eq "OK") {
     
     def set_api_key(self, show_message=True):
         """APIキーを設定"""
+        from tkinter import messagebox
+        
         api_key = self.api_key_var.get().strip()
         if not api_key:
             if show_message:
@@ -465,7 +1567,28 @@ if ($result -eq "OK") {
             return
         
         success = self.subtitle_gen.set_api_key(api_key)
-        if success:
+        if not success:
+            self.on_api_key_checked(api_key, None, False, show_message)
+            return
+        client = self.subtitle_gen.client
+        
+        # 有効性の確認は通信を伴うため、GUIを止めないよう別スレッドで行う
+        self.api_status_label.config(text="確認中...", fg="orange")
+        self.status_var.set("APIキーを確認中...")
+        
+        def validate_thread():
+            valid = self.subtitle_gen.validate_api_key(client)
+            self.post_to_ui(self.on_api_key_checked, api_key, client, valid, show_message)
+        
+        threading.Thread(target=validate_thread, daemon=True).start()
+    
+    def on_api_key_checked(self, api_key, client, valid, show_message):
+        """APIキーの確認結果を表示（確認中に別のキーが設定された場合、古いキーの結果は無視する）"""
+        from tkinter import messagebox
+        
+        if client is not None and client is not self.subtitle_gen.client:
+            return
+        if valid:
             self.config_manager.set_api_key(api_key)
             self.api_status_label.config(text="✓ 設定済み", fg="green")
             self.status_var.set("準備完了")
@@ -479,6 +1602,8 @@ if ($result -eq "OK") {
     
     def show_api_settings(self):
         """API設定ダイアログを表示"""
+        import tkinter as tk
+        
         dialog = tk.Toplevel(self.root)
         dialog.title("OpenAI API設定")
         dialog.geometry("500x300")
@@ -495,7 +1620,9 @@ if ($result -eq "OK") {
 
 料金（目安）：
 - Whisper API: $0.006/分（約0.9円/分）
-- GPT-4翻訳: $0.03/1000トークン（約4.5円/1000文字）
+- GPT-4翻訳（品質優先）: $0.03/1000トークン（約4.5円/1000文字）
+- gpt-4o-mini翻訳（速度優先）: GPT-4の数十分の一程度
+- Batch (安価) を選ぶと翻訳料金が約半額（完了まで最大24時間）
 """
         
         tk.Label(dialog, text=info_text, justify=tk.LEFT, font=("", 10)).pack(padx=20, pady=10)
@@ -515,13 +1642,17 @@ if ($result -eq "OK") {
         tk.Button(button_frame, text="キャンセル", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
     
     def update_progress(self, message):
-        """プログレス表示を更新"""
-        self.progress_var.set(message)
-        self.root.update()
+        """プログレス表示を更新（処理スレッドから呼ばれる）"""
+        self.post_to_ui(self.progress_var.set, message)
     
     def open_file(self):
         """WAVファイルを開いて処理"""
-        if self.subtitle_gen.client is None:
+        from tkinter import filedialog, messagebox
+        
+        self.subtitle_gen.translation_model = TRANSLATION_MODELS[self.translation_model_var.get()]
+        self.subtitle_gen.translation_engine = self.translation_engine_var.get()
+        self.subtitle_gen.stt_engine = self.stt_engine_var.get()
+        if self.subtitle_gen.requires_api_key() and self.subtitle_gen.client is None:
             messagebox.showerror("エラー", "OpenAI APIキーを設定してください")
             return
         
@@ -535,56 +1666,87 @@ if ($result -eq "OK") {
         
         if file_path:
             self.status_var.set("処理中...")
+            batch_mode = self.batch_mode_var.get()
+            # 翻訳結果は届いた分から日本語タブに表示する
+            self.set_text(self.japanese_text, "")
             
             def process_thread():
+                # Tkはメインスレッド以外から操作しないため、結果の表示はキュー経由で行う
                 try:
-                    result = self.subtitle_gen.process_wav_file(file_path, self.update_progress)
-                    
-                    if isinstance(result, str):
-                        # エラーの場合
-                        messagebox.showerror("エラー", result)
-                        self.status_var.set("エラー")
-                        return
-                    
-                    # 成功の場合
-                    self.current_segments = result['segments']
-                    self.display_results(result, os.path.basename(file_path))
-                    self.status_var.set("処理完了")
-                    self.progress_var.set("")
-                    
+                    result = self.subtitle_gen.process_wav_file(file_path, self.update_progress, batch_mode,
+                                                                self.append_streamed_text)
                 except Exception as e:
-                    messagebox.showerror("エラー", f"処理中にエラーが発生しました: {e}")
-                    self.status_var.set("エラー")
-                    self.progress_var.set("")
+                    result = f"処理中にエラーが発生しました: {e}"
+                self.post_to_ui(self.on_process_finished, result, os.path.basename(file_path))
             
             threading.Thread(target=process_thread, daemon=True).start()
     
-    def display_results(self, result, filename):
-        """結果を各タブに表示"""
-        segments = result['segments']
+    def on_process_finished(self, result, filename):
+        """処理結果を表示"""
+        from tkinter import messagebox
+        
+        if isinstance(result, str):
+            # エラーの場合
+            messagebox.showerror("エラー", result)
+            self.status_var.set("エラー")
+            self.progress_var.set("")
+            return
+        
+        # 成功の場合
+        self.current_segments = result['segments']
+        self.display_results(result, filename)
+        cache_hit_ratio = result.get('cache_hit_ratio')
+        if cache_hit_ratio is None:
+            self.status_var.set("処理完了")
+        else:
+            self.status_var.set(f"処理完了（翻訳キャッシュヒット率: {cache_hit_ratio:.0%}）")
+        self.progress_var.set("")
+    
+    def append_streamed_text(self, text):
+        """翻訳途中の文字列を日本語タブに追記（処理スレッドから呼ばれる）"""
+        self.post_to_ui(self.insert_streamed_text, text)
+    
+    def insert_streamed_text(self, text):
+        """翻訳途中の文字列を日本語タブの末尾に挿入"""
+        import tkinter as tk
         
-        # 対訳テキスト表示
-        bilingual_content = self.subtitle_gen.generate_bilingual_text(segments)
-        bilingual_content = f"ファイル: {filename}\n\n" + bilingual_content
-        self.bilingual_text.delete(1.0, tk.END)
-        self.bilingual_text.insert(1.0, bilingual_content)
+        self.japanese_text.insert(tk.END, text)
+        self.japanese_text.see(tk.END)
+    
+    def set_text(self, widget, content, read_only=False):
+        """テキストウィジェットの内容を1回の挿入で置き換え"""
+        import tkinter as tk
         
-        # SRT字幕表示
-        srt_content = self.subtitle_gen.generate_srt_content(segments)
-        self.srt_text.delete(1.0, tk.END)
-        self.srt_text.insert(1.0, srt_content)
+        widget.config(state=tk.NORMAL)
+        widget.delete(1.0, tk.END)
+        if content:
+            widget.insert(1.0, content)
+        if read_only:
+            # 長い結果は編集不可にして、入力のたびに再レイアウトされるのを防ぐ
+            widget.config(state=tk.DISABLED)
+    
+    def display_results(self, result, filename):
+        """結果を各タブに表示（3つのタブの内容を1回のループで作成）"""
+        segments = result['segments']
+        subtitle_gen = self.subtitle_gen
         
-        # 日本語のみ表示
-        japanese_content = f"ファイル: {filename}\n"
-        japanese_content += "=" * 50 + "\n\n"
+        bilingual_parts = [f"ファイル: {filename}\n\n", subtitle_gen.generate_bilingual_header()]
+        srt_parts = []
+        japanese_parts = [f"ファイル: {filename}\n", "=" * 50 + "\n\n"]
         for i, segment in enumerate(segments, 1):
-            japanese_content += f"{i:02d}. {segment['japanese']}\n\n"
+            bilingual_parts.append(subtitle_gen.format_cue_bilingual(i, segment))
+            srt_parts.append(subtitle_gen.format_cue_srt(i, segment))
+            japanese_parts.append(subtitle_gen.format_cue_japanese(i, segment))
         
-        self.japanese_text.delete(1.0, tk.END)
-        self.japanese_text.insert(1.0, japanese_content)
+        read_only = len(segments) > READ_ONLY_SEGMENT_THRESHOLD
+        self.set_text(self.bilingual_text, "".join(bilingual_parts), read_only)
+        self.set_text(self.srt_text, "".join(srt_parts), read_only)
+        self.set_text(self.japanese_text, "".join(japanese_parts), read_only)
     
     def save_srt(self):
         """SRT字幕ファイルを保存"""
+        from tkinter import filedialog, messagebox
+        
         if not self.current_segments:
             messagebox.showwarning("警告", "保存する字幕データがありません")
             return
@@ -607,6 +1769,8 @@ if ($result -eq "OK") {
     
     def save_bilingual_text(self):
         """対訳テキストファイルを保存"""
+        from tkinter import filedialog, messagebox
+        
         if not self.current_segments:
             messagebox.showwarning("警告", "保存するテキストデータがありません")
             return
@@ -629,9 +1793,9 @@ if ($result -eq "OK") {
     
     def clear_result(self):
         """結果をクリア"""
-        self.bilingual_text.delete(1.0, tk.END)
-        self.srt_text.delete(1.0, tk.END)
-        self.japanese_text.delete(1.0, tk.END)
+        self.set_text(self.bilingual_text, "")
+        self.set_text(self.srt_text, "")
+        self.set_text(self.japanese_text, "")
         self.current_segments = None
         self.progress_var.set("")
         self.status_var.set("クリア完了")
@@ -641,29 +1805,106 @@ if ($result -eq "OK") {
         self.root.mainloop()
 
 class ConfigManager:
+    # 読み込み済みの設定（パス → (更新時刻, ConfigParser)）。ファイルが変わらなければ再解析しない
+    _cache = {}
+    # 暗号化して保存した値の接頭辞
+    ENCRYPTED_PREFIX = "enc:"
+    # APIキーをOSの資格情報ストアに保存したことを示す値と、その登録名
+    KEYRING_VALUE = "keyring:"
+    KEYRING_SERVICE = "wav_subtitle"
+    KEYRING_USERNAME = "openai_api_key"
+    
     def __init__(self):
-        if not IMPORTS_OK:
-            return
         self.config_file = "subtitle_config.ini"
-        self.config = configparser.ConfigParser()
         self.load_config()
     
     def load_config(self):
         """設定を読み込み"""
-        if os.path.exists(self.config_file):
-            self.config.read(self.config_file, encoding='utf-8')
+        import configparser
+        path = os.path.abspath(self.config_file)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        cached = ConfigManager._cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            self.config = cached[1]
+            return
+        
+        self.config = configparser.ConfigParser()
+        if mtime is not None:
+            self.config.read(path, encoding='utf-8')
+        ConfigManager._cache[path] = (mtime, self.config)
     
     def save_config(self):
-        """設定を保存"""
-        with open(self.config_file, 'w', encoding='utf-8') as f:
+        """設定を保存（一時ファイルに書いてから置き換え、書き込み中の異常終了でも壊れないようにする）"""
+        path = os.path.abspath(self.config_file)
+        temp_file = path + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
             self.config.write(f)
+        os.replace(temp_file, path)
+        ConfigManager._cache[path] = (os.path.getmtime(path), self.config)
+    
+    def get_keyring(self):
+        """OSの資格情報ストア（keyring）を取得（未導入・利用できるバックエンドがない場合はNone）"""
+        try:
+            import keyring
+            from keyring.backends import fail
+        except ImportError:
+            return None
+        if isinstance(keyring.get_keyring(), fail.Keyring):
+            return None
+        return keyring
+    
+    def get_fernet(self):
+        """APIキー難読化用のFernetを取得（cryptography未導入時はNone）"""
+        try:
+            import base64
+            import getpass
+            import platform
+            from cryptography.fernet import Fernet
+        except ImportError:
+            return None
+        # OSのユーザー名とマシン名から鍵を作る。ユーザー名とマシン名が分かれば復元できるため
+        # 暗号化ではなく平文で置かないための難読化にすぎない（マシン名が変わると読めなくなり再入力が必要）
+        seed = f"wav_subtitle:{getpass.getuser()}@{platform.node()}".encode('utf-8')
+        return Fernet(base64.urlsafe_b64encode(hashlib.sha256(seed).digest()))
     
     def get_api_key(self):
         """APIキーを取得"""
-        return self.config.get('openai', 'api_key', fallback='')
+        api_key = self.config.get('openai', 'api_key', fallback='')
+        if api_key == self.KEYRING_VALUE:
+            keyring = self.get_keyring()
+            if keyring is None:
+                return ''
+            try:
+                return keyring.get_password(self.KEYRING_SERVICE, self.KEYRING_USERNAME) or ''
+            except Exception as e:
+                logger.warning("資格情報ストアからAPIキーを読み込めません: %s", e)
+                return ''
+        if not api_key.startswith(self.ENCRYPTED_PREFIX):
+            return api_key
+        
+        fernet = self.get_fernet()
+        if fernet is None:
+            return ''
+        try:
+            return fernet.decrypt(api_key[len(self.ENCRYPTED_PREFIX):].encode('ascii')).decode('utf-8')
+        except Exception as e:
+            logger.warning("APIキーの復号に失敗しました: %s", e)
+            return ''
     
     def set_api_key(self, api_key):
-        """APIキーを設定"""
+        """APIキーを設定（OSの資格情報ストアが使えればそこに保存し、設定ファイルには残さない）"""
+        keyring = self.get_keyring()
+        stored = False
+        if keyring is not None:
+            try:
+                keyring.set_password(self.KEYRING_SERVICE, self.KEYRING_USERNAME, api_key)
+                api_key = self.KEYRING_VALUE
+                stored = True
+            except Exception as e:
+                logger.warning("資格情報ストアにAPIキーを保存できません: %s", e)
+        fernet = None if stored else self.get_fernet()
+        if fernet is not None:
+            api_key = self.ENCRYPTED_PREFIX + fernet.encrypt(api_key.encode('utf-8')).decode('ascii')
         if 'openai' not in self.config:
             self.config.add_section('openai')
         self.config.set('openai', 'api_key', api_key)
@@ -695,15 +1936,29 @@ def install_requirements():
     print("py wav_subtitle.py")
     input("\nEnterキーを押して終了...")
 
+def find_missing_module():
+    """不足しているライブラリを確認（読み込みはせず存在のみ確認）"""
+    import importlib.util
+    for name in ("tkinter", "openai"):
+        if importlib.util.find_spec(name) is None:
+            return f"No module named '{name}'"
+    return ""
+
 def main():
     """メイン関数"""
     print("英語音声→日本語字幕生成ツール（WAV専用・FFmpeg不要版）")
     print("=" * 70)
     
+    # --installはライブラリが不足していても実行可能
+    if len(sys.argv) > 1 and sys.argv[1] == "--install":
+        install_requirements()
+        return
+    
     # インポートエラーのチェック
-    if not IMPORTS_OK:
+    missing_module = find_missing_module()
+    if missing_module:
         print("❌ 必要なライブラリがインストールされていません")
-        print(f"エラー: {MISSING_MODULE}")
+        print(f"エラー: {missing_module}")
         print("\n📦 以下の方法でライブラリをインストールしてください:")
         print("\n方法1: 自動インストール")
         print("  py wav_subtitle.py --install")
@@ -713,10 +1968,6 @@ def main():
         input("\nEnterキーを押して終了...")
         return
     
-    if len(sys.argv) > 1 and sys.argv[1] == "--install":
-        install_requirements()
-        return
-    
     try:
         app = SubtitleGeneratorGUI()
         app.run()
@@ -725,8 +1976,4 @@ def main():
         input("Enterキーを押して終了...")
 
 if __name__ == "__main__":
-    if not IMPORTS_OK and len(sys.argv) > 1 and sys.argv[1] == "--install":
-        # インポートエラーがある場合でも--installは実行可能
-        install_requirements()
-    else:
-        main()
+    main()